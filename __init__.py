@@ -1,2 +1,4 @@
 from core.move1 import MOVE1
-from core.move3 import MOVE3
\ No newline at end of file
+from core.move3 import MOVE3
+from core.longrecord import LongRecordIndex
+from core.network import ExtensionNetwork
\ No newline at end of file
@@ -1 +1 @@
-__all__ = ["move3", 'move1']
\ No newline at end of file
+__all__ = ["move3", 'move1', 'longrecord', 'network']
\ No newline at end of file
@@ -0,0 +1,222 @@
+#-------------------------------------------------------------------------------
+# Name          Long record index
+# Description:  Precomputed index of a long record gage so a single index
+#               station can be reused across many short record sites
+#               without re-reading or re-transforming the long record.
+#               Subset moments (Equations 8-5 and 8-6) are computed from
+#               prefix sums of the log flows.
+# Author:       Daniel Hamill
+#               US Army Corps of Engineers
+#               Sacramento District
+#               Daniel.D.Hamill@usace.army.mil
+# Created:      19 October 2026
+#-------------------------------------------------------------------------------
+
+import datetime
+
+import numpy as np
+
+
+class LongRecordIndex(object):
+    """Sorted time axis, log10 flows and prefix sums for a long record.
+
+    ``times`` must be strictly increasing. Keys are compared directly with
+    the short record keys, so use integer water years for MOVE3 and
+    datetimes for MOVE1 (see ``from_merge_data``).
+    """
+
+    DIRECTIONS = ('backward', 'forward', 'nearest')
+
+    def __init__(self, times, flows) -> None:
+
+        self.times = np.asarray(times)
+        self.flows = np.asarray(flows, dtype=float)
+        assert self.times.ndim == 1 and len(self.times) == len(self.flows)
+        assert np.all(self.times[1:] > self.times[:-1])
+
+        self.log_flows = np.log10(self.flows)
+        self.n = len(self.log_flows)
+
+        # Shift by the record mean before accumulating so the sum of squares
+        # does not lose precision to cancellation
+        self._shift = np.mean(self.log_flows) if self.n else 0.0
+        _dev = self.log_flows - self._shift
+        self._csum = np.concatenate([[0.0], np.cumsum(_dev)])
+        self._csum_sq = np.concatenate([[0.0], np.cumsum(_dev**2)])
+
+        self._time_list = None
+
+    @property
+    def time_list(self):
+        """``times`` as a list of python ints or datetimes, converted once
+        and shared by every MOVE1/MOVE3 built on this index."""
+        if self._time_list is None:
+            if self.times.dtype.kind == 'M':
+                self._time_list = self.times.astype('datetime64[us]').tolist()
+            else:
+                self._time_list = self.times.tolist()
+        return self._time_list
+
+    @classmethod
+    def from_merge_data(cls, merge_data, time_col='WY'):
+        """Build the index from the long record rows of a merged DataFrame.
+
+        ``time_col='WY'`` keys the index by integer water year (MOVE3),
+        any other column is keyed by its datetime64 values (MOVE1).
+        """
+        long_data = merge_data.loc[merge_data.recordType == 'Long Record']
+        if time_col == 'WY':
+            times = long_data[time_col].dt.year.values
+        else:
+            times = long_data[time_col].values
+        return cls(times, long_data['FLOW'].values)
+
+    def locate(self, keys, tolerance=None, direction='nearest'):
+        """Return (positions in the index, boolean mask of ``keys`` matched).
+
+        With ``tolerance=None`` keys must match exactly.  Otherwise each key
+        is paired with the index time in ``direction`` ('backward' - at or
+        before the key, 'forward' - at or after, 'nearest' - either) lying
+        within ``tolerance``.  Each index position is paired at most once,
+        with the closest key.
+        """
+        if direction not in self.DIRECTIONS:
+            raise ValueError(
+                f"direction must be one of {self.DIRECTIONS}, got '{direction}'"
+            )
+
+        keys = np.asarray(keys)
+        if tolerance is None:
+            pos = np.searchsorted(self.times, keys)
+            found = pos < self.n
+            found[found] = self.times[pos[found]] == keys[found]
+            return pos[found], found
+
+        _is_delta = isinstance(tolerance, (datetime.timedelta, np.timedelta64))
+        if keys.dtype.kind == 'M':
+            if not _is_delta:
+                raise TypeError(
+                    f"tolerance for datetime keys must be a Timedelta or timedelta, got {type(tolerance).__name__}"
+                )
+            tolerance = np.timedelta64(tolerance)
+            if tolerance < np.timedelta64(0):
+                raise ValueError(f"tolerance must not be negative, got {tolerance}")
+        else:
+            if _is_delta:
+                raise TypeError(
+                    f"tolerance for numeric keys (e.g. water years) must be a number, got {type(tolerance).__name__}"
+                )
+            if tolerance < 0:
+                raise ValueError(f"tolerance must not be negative, got {tolerance}")
+
+        _back = np.searchsorted(self.times, keys, side='right') - 1
+        _fwd = np.searchsorted(self.times, keys, side='left')
+        if direction == 'backward':
+            pos = _back
+        elif direction == 'forward':
+            pos = _fwd
+        else:
+            _fwd_lag = np.abs(self.times[np.minimum(_fwd, self.n-1)] - keys)
+            _back_lag = np.abs(keys - self.times[np.maximum(_back, 0)])
+            pos = np.where(
+                (_back < 0) | ((_fwd < self.n) & (_fwd_lag < _back_lag)), _fwd, _back
+            )
+
+        valid = (pos >= 0) & (pos < self.n)
+        pos = np.clip(pos, 0, self.n-1)
+        lag = np.abs(keys - self.times[pos])
+        valid &= lag <= tolerance
+
+        #Keep the closest key for each index position
+        cand = np.flatnonzero(valid)
+        order = cand[np.lexsort((lag[cand], pos[cand]))]
+        keep = np.ones(len(order), dtype=bool)
+        keep[1:] = pos[order][1:] != pos[order][:-1]
+        found = np.zeros(len(keys), dtype=bool)
+        found[order[keep]] = True
+        return pos[found], found
+
+    def complement(self, positions):
+        """Positions of the index not contained in ``positions``."""
+        mask = np.ones(self.n, dtype=bool)
+        mask[positions] = False
+        return np.flatnonzero(mask)
+
+    def _moments(self, n, s, s_sq):
+        if n == 0:
+            return 0, np.nan, 0
+        mean = s/n
+        if n > 1:
+            var = max(s_sq - n*mean**2, 0.0)/(n-1)
+        else:
+            var = 0
+        return n, mean + self._shift, var
+
+    def moments(self, positions=None):
+        """Count, mean and sample variance of the log flows at ``positions``.
+
+        With ``positions=None`` the moments of the full record are returned.
+        """
+        if positions is None:
+            return self._moments(self.n, self._csum[-1], self._csum_sq[-1])
+        positions = np.asarray(positions, dtype=int)
+        _dev = self.log_flows[positions] - self._shift
+        return self._moments(len(positions), np.sum(_dev), np.sum(_dev**2))
+
+    def complement_moments(self, positions):
+        """Moments of every position not in ``positions``.
+
+        Only the (typically short) subset is summed, the remainder comes from
+        the record totals.
+        """
+        positions = np.asarray(positions, dtype=int)
+        _dev = self.log_flows[positions] - self._shift
+        return self._moments(
+            self.n - len(positions),
+            self._csum[-1] - np.sum(_dev),
+            self._csum_sq[-1] - np.sum(_dev**2)
+        )
+
+    def range_moments(self, start, stop):
+        """Moments of the contiguous positions ``start:stop``.
+
+        ``start`` and ``stop`` may be arrays, in which case every window is
+        evaluated at once.
+        """
+        start = np.asarray(start)
+        stop = np.asarray(stop)
+        n = stop - start
+        s = self._csum[stop] - self._csum[start]
+        s_sq = self._csum_sq[stop] - self._csum_sq[start]
+        if n.ndim == 0:
+            return self._moments(int(n), s, s_sq)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = s/n
+            var = np.where(n > 1, np.maximum(s_sq - n*mean**2, 0.0)/(n-1), 0.0)
+        return n, mean + self._shift, var
+
+    def window_moments(self, width, positions=None):
+        """Moments of every run of ``width`` consecutive entries of the
+        ordered ``positions`` (all positions of the index by default).
+
+        Returns (starts, mean, variance) where ``starts`` index into
+        ``positions``, all windows evaluated at once from cumulative sums.
+        """
+        if positions is None:
+            starts = np.arange(max(self.n - width + 1, 0))
+            _, mean, var = self.range_moments(starts, starts+width)
+            return starts, mean, var
+
+        _dev = self.log_flows[np.asarray(positions, dtype=int)] - self._shift
+        n = len(_dev)
+        starts = np.arange(max(n - width + 1, 0))
+        _csum = np.concatenate([[0.0], np.cumsum(_dev)])
+        _csum_sq = np.concatenate([[0.0], np.cumsum(_dev**2)])
+        s = _csum[starts+width] - _csum[starts]
+        s_sq = _csum_sq[starts+width] - _csum_sq[starts]
+        mean = s/width
+        if width > 1:
+            var = np.maximum(s_sq - width*mean**2, 0.0)/(width-1)
+        else:
+            var = np.zeros_like(mean)
+        return starts, mean + self._shift, var
@@ -14,71 +14,74 @@
 #-------------------------------------------------------------------------------
 
 import numpy as np
+from .longrecord import LongRecordIndex
 
 class MOVE1(object):
 
-    def __init__(self, merge_data, roundInt=True) -> None:
+    def __init__(self, merge_data, roundInt=True, long_index=None,
+                 tolerance=None, direction='nearest') -> None:
         
         self.merge_data = merge_data
         self.roundInt = roundInt
-        
-        #MOVE1 Constant Parameters
-        self.long_record_flows = np.log10(
-            list(
-                self.merge_data.loc[self.merge_data.recordType == 'Long Record', 'FLOW']
-            )
-        )
-        self.long_dates = list(
-            self.merge_data.loc[
-                self.merge_data.recordType == 'Long Record', 'date'
-                ].dt.to_pydatetime()
-            )
 
-        assert all(x<y for x,y in zip(self.long_dates, self.long_dates[1:]))
-        self.short_record_flows =np.log10(
-            list(
-                self.merge_data.loc[self.merge_data.recordType == 'Short Record', 'FLOW']
-                )
-        )
-        self.short_dates = list(
-            self.merge_data.loc[
-                self.merge_data.recordType == 'Short Record', 'date'
-                ].dt.to_pydatetime()
+        #Concurrent observations are paired on exact dates unless a
+        #tolerance (e.g. pd.Timedelta('1D')) is given, in which case each
+        #short record date is paired with the long record date in direction
+        #('backward', 'forward' or 'nearest') within the tolerance
+        if direction not in LongRecordIndex.DIRECTIONS:
+            raise ValueError(
+                f"direction must be one of {LongRecordIndex.DIRECTIONS}, got '{direction}'"
             )
-        assert all(x<y for x,y in zip(self.short_dates, self.short_dates[1:]))
+        self.tolerance = tolerance
+        self.direction = direction
+
+        #A LongRecordIndex can be shared across short sites paired with the
+        #same long record gage.  When supplied, Long Record rows in
+        #merge_data are ignored.
+        if long_index is None:
+            long_index = LongRecordIndex.from_merge_data(self.merge_data, 'date')
+        self.long_index = long_index
         
-        self.concurrent_dates = [i for i in self.long_dates if i in self.short_dates]
+        #MOVE1 Constant Parameters
+        self.long_record_flows = self.long_index.log_flows
+        self.long_dates = self.long_index.time_list
 
-        self._ind1 = [
-            self.long_dates.index(date) for date in 
-                        self.concurrent_dates if date in self.long_dates
-            ]
+        _short_data = self.merge_data.loc[self.merge_data.recordType == 'Short Record']
+        self.short_record_flows =np.log10(list(_short_data['FLOW']))
+        _short_times = _short_data['date'].values
+        self.short_dates = list(_short_data['date'].dt.to_pydatetime())
+        assert all(x<y for x,y in zip(self.short_dates, self.short_dates[1:]))
 
-        self._ind2 = [
-            self.short_dates.index(date) for date in 
-                        self.concurrent_dates if date in self.short_dates]
+        _ind1, _found = self.long_index.locate(
+            _short_times, self.tolerance, self.direction
+        )
+        self._ind1 = _ind1.tolist()
+        self._ind2 = np.flatnonzero(_found).tolist()
+        self.concurrent_dates = [self.long_dates[i] for i in self._ind1]
+
+        #(long record date, short record date) of each concurrent pair and
+        #the lag of the short record observation
+        self.matched_pairs = list(
+            zip(self.concurrent_dates, [self.short_dates[i] for i in self._ind2])
+        )
+        self.time_lags = _short_times[self._ind2] - self.long_index.times[_ind1]
 
-        self.con_long_flows = np.array(self.long_record_flows)[self._ind1]
+        self.con_long_flows = self.long_record_flows[_ind1]
 
         self.con_short_flows = np.array(self.short_record_flows)[self._ind2]
 
-        self.additional_dates = [
-            i for i in self.long_dates if i not in self.short_dates
-        ]
-
-        self._ind3 =  [
-            self.long_dates.index(year) for year 
-                in self.additional_dates if year in self.long_dates
-        ]
-
-        self.additional_flows  = np.array(self.long_record_flows)[self._ind3]
+        #Long record dates already present in the short record are never
+        #treated as additional, even when paired to a different date
+        _covered = np.union1d(_ind1, self.long_index.locate(_short_times)[0]).astype(int)
+        self._ind3 = self.long_index.complement(_covered)
 
         self.n1 = len(self.con_short_flows)
-        self.n2 = len(self.additional_flows)
+
+        # Moments of the concurrent and additional periods come from the index
+        self.n2, self.xbar2, self._s_sq_x2 = self.long_index.complement_moments(_covered)
 
         self.ybar1 = np.mean(self.con_short_flows)
-        self.xbar1 = np.mean(self.con_long_flows)
-        self.xbar2 = np.mean(self.additional_flows)
+        _, self.xbar1, self._s_sq_x1 = self.long_index.moments(_ind1)
 
         #Calculation Parameters
         self.s_sq_y1 = None
@@ -87,6 +90,14 @@ class MOVE1(object):
         self._bhat_top = 0.0
         self._bhat_bottom = 0.0
 
+    @property
+    def additional_dates(self):
+        return [self.long_dates[i] for i in self._ind3]
+
+    @property
+    def additional_flows(self):
+        return self.long_record_flows[self._ind3]
+
     def comp_variance(self, record):
         if len(record)>1:
             n1 = len(record)
@@ -103,10 +114,10 @@ class MOVE1(object):
         self.s_sq_y1 = self.comp_variance(self.con_short_flows) 
 
         # Equation 8-5
-        self.s_sq_x1 = self.comp_variance(self.con_long_flows) 
+        self.s_sq_x1 = self._s_sq_x1
 
         # Equation 8-6
-        self.s_sq_x2 = self.comp_variance(self.additional_flows) 
+        self.s_sq_x2 = self._s_sq_x2
 
         for _i, _xi in enumerate(self.con_long_flows):
             self._bhat_top += (_xi - self.xbar1)*(self.con_short_flows[_i]-self.ybar1)
@@ -123,8 +134,7 @@ class MOVE1(object):
         else:
             self.short_record_flows = [10**x for x in self.short_record_flows]
         
-        missing_dates = [i for i in self.long_dates if i not in self.short_dates]
-        idx_lus = [self.long_dates.index(i) for i in missing_dates]
+        idx_lus = self._ind3
         
         self.extension_flows = []
         self.extension_dates = []
@@ -23,42 +23,90 @@
 #               More robust logic for selecting years to gap fill in short station
 #               5 Dec 2023
 #               Removed latex equations
+#               19 Oct 2026
+#               Accept a precomputed LongRecordIndex for the long record
+#               Selectable extension period (recent or best matching window)
+#               Tolerance based matching of concurrent years
 #-------------------------------------------------------------------------------
 
 import numpy as np
+from .longrecord import LongRecordIndex
 
 
 class MOVE3(object):
 
-    def __init__(self, merge_data, roundInt=True):
+    EXTENSION_METHODS = ('recent', 'window')
+
+    def __init__(self, merge_data, roundInt=True, long_index=None,
+                 extension_method='recent', exclude_years=None,
+                 tolerance=None, direction='nearest'):
 
         self.merge_data = merge_data
         self.roundInt = roundInt
+
+        #Concurrent years are paired on exact water year unless a tolerance
+        #in years is given (see MOVE1)
+        if direction not in LongRecordIndex.DIRECTIONS:
+            raise ValueError(
+                f"direction must be one of {LongRecordIndex.DIRECTIONS}, got '{direction}'"
+            )
+        self.tolerance = tolerance
+        self.direction = direction
+
+        #Extension period selection
+        #   recent - the last ne years of the additional record
+        #   window - the run of ne consecutive additional years (spanning the
+        #            concurrent period if need be) whose mean and variance
+        #            best match the additional record
+        #exclude_years are dropped from the additional record before any
+        #extension (mean, var and n2) is selected; they still count toward
+        #the Equation 8-6 moments
+        if extension_method not in self.EXTENSION_METHODS:
+            raise ValueError(
+                f"extension_method must be one of {self.EXTENSION_METHODS}, got '{extension_method}'"
+            )
+        self.extension_method = extension_method
+        self.exclude_years = [] if exclude_years is None else list(exclude_years)
+
+        #A LongRecordIndex can be shared across short sites paired with the
+        #same long record gage.  When supplied, Long Record rows in
+        #merge_data are ignored.
+        if long_index is None:
+            long_index = LongRecordIndex.from_merge_data(self.merge_data, 'WY')
+        self.long_index = long_index
+
         #MOVE3 Constant Parameters
-        self.long_record = np.log10(list(self.merge_data.loc[self.merge_data.recordType == 'Long Record', 'FLOW']))
-        self.long_years = list(self.merge_data.loc[self.merge_data.recordType == 'Long Record', 'WY'].dt.year)
-        assert all(x<y for x,y in zip(self.long_years, self.long_years[1:]))
+        self.long_record = self.long_index.log_flows
+        self.long_years = self.long_index.time_list
         self.short_record =np.log10(list(self.merge_data.loc[self.merge_data.recordType == 'Short Record', 'FLOW']))
         self.short_years = list(self.merge_data.loc[self.merge_data.recordType == 'Short Record', 'WY'].dt.year)
         assert all(x<y for x,y in zip(self.short_years, self.short_years[1:]))
-        self.concurrent_years = [i for i in self.long_years if i in self.short_years]
-
-
-        self._ind1 = [self.long_years.index(year) for year in self.concurrent_years if year in self.long_years]
-        self._ind2 = [self.short_years.index(year) for year in self.concurrent_years if year in self.short_years]
 
-        self.con_long_record = np.array(self.long_record)[self._ind1]
+        _ind1, _found = self.long_index.locate(
+            self.short_years, self.tolerance, self.direction
+        )
+        self._ind1 = _ind1.tolist()
+        self._ind2 = np.flatnonzero(_found).tolist()
+        self.concurrent_years = [self.long_years[i] for i in self._ind1]
+        self.matched_pairs = list(
+            zip(self.concurrent_years, [self.short_years[i] for i in self._ind2])
+        )
+        self.time_lags = np.asarray(self.short_years)[self._ind2] - self.long_index.times[_ind1]
+
+        self.con_long_record = self.long_record[_ind1]
         self.con_short_record = np.array(self.short_record)[self._ind2]
-        self.additional_years = [i for i in self.long_years if i not in self.short_years]
-        self._ind3 =  [self.long_years.index(year) for year in self.additional_years if year in self.long_years]
-        self.additional_record  = np.array(self.long_record)[self._ind3]
+        #Long record dates already present in the short record are never
+        #treated as additional, even when paired to a different date
+        _covered = np.union1d(_ind1, self.long_index.locate(self.short_years)[0]).astype(int)
+        self._ind3 = self.long_index.complement(_covered)
 
         self.n1 = len(self.con_short_record)
-        self.n2 = len(self.additional_record )
+
+        # Moments of the concurrent and additional periods come from the index
+        self.n2, self.xbar2, self._s_sq_x2 = self.long_index.complement_moments(_covered)
 
         self.ybar1 = np.mean(self.con_short_record)
-        self.xbar1 = np.mean(self.con_long_record)
-        self.xbar2 = np.mean(self.additional_record)
+        _, self.xbar1, self._s_sq_x1 = self.long_index.moments(_ind1)
 
         #Calculation Parameters
         self.s_sq_y1 = None
@@ -148,6 +196,14 @@ class MOVE3(object):
         self.extension_short_record_n2 = None
         self.extended_short_years_n2 = None
 
+    @property
+    def additional_years(self):
+        return [self.long_years[i] for i in self._ind3]
+
+    @property
+    def additional_record(self):
+        return self.long_record[self._ind3]
+
     def comp_variance(self, record):
         if len(record)>1:
             n1 = len(record)
@@ -158,16 +214,48 @@ class MOVE3(object):
             return 0
     # if computing the variance for ne=1 this fails
 
+    def extension_pool(self):
+        """Long record positions available for extension: the additional
+        (non-concurrent) years less any exclude_years, in time order."""
+
+        idx_lus = self._ind3
+        if self.exclude_years:
+            idx_lus = idx_lus[~np.isin(self.long_index.times[idx_lus], self.exclude_years)]
+        return idx_lus
+
+    def select_extension(self, ne):
+        """Return long record positions used to extend the short record by ne years."""
+
+        idx_lus = self.extension_pool()
+
+        if self.extension_method == 'recent' or ne <= 0 or ne >= len(idx_lus):
+            return idx_lus[-ne:]
+
+        #Every run of ne consecutive years of the extension pool (which may
+        #span the concurrent period, as 'recent' does), scored against the
+        #pool by the squared departure of the mean (in standard deviations)
+        #and of the variance (relative)
+        _, ref_mean, ref_var = self.long_index.moments(idx_lus)
+        starts, win_mean, win_var = self.long_index.window_moments(ne, idx_lus)
+        if ref_var > 0:
+            score = (win_mean - ref_mean)**2/ref_var + ((win_var - ref_var)/ref_var)**2
+        else:
+            score = (win_mean - ref_mean)**2
+
+        #ties go to the most recent window
+        start = starts[len(starts) - 1 - int(np.argmin(score[::-1]))]
+        return idx_lus[start:start+ne]
+
     def calculate(self):
         
         # Equation 8-4
         self.s_sq_y1 = self.comp_variance(self.con_short_record) 
 
         # Equation 8-5
-        self.s_sq_x1 = self.comp_variance(self.con_long_record) 
+        self.s_sq_x1 = self._s_sq_x1
 
         # Equation 8-6
-        self.s_sq_x2 = self.comp_variance(self.additional_record) 
+        self.s_sq_x2 = self._s_sq_x2
 
         # Equation 8-11
         self.alpha_sq = (self.n2*(self.n1-4)*(self.n1-1))/((self.n2-1)*(self.n1-3)*(self.n1-2)) 
@@ -228,21 +316,16 @@ class MOVE3(object):
         self.ne_n1_mean_int = int(round(self.ne_n1_mean))
         self.ne_mean = self.ne_n1_mean_int - self.n1
 
-        missing_years = [i for i in self.long_years if i not in self.short_years]
-        idx_lus = [self.long_years.index(i) for i in missing_years]
-        
         self.extension_record_mean = []
         self.extension_years_mean = []
-        for idx_lu in idx_lus[-self.ne_mean:]:
+        _extension_mean = self.select_extension(self.ne_mean)
+        for idx_lu in _extension_mean:
             self.extension_record_mean.append(self.long_record[idx_lu])
             self.extension_years_mean.append(self.long_years[idx_lu])
 
         #mean extension record
-        #Equation 8-21
-        self.xe_bar_mean = np.mean(self.extension_record_mean)
-
-        #Equation 8-22
-        self.s_sq_xe_mean = self.comp_variance(self.extension_record_mean) 
+        #Equation 8-21 and 8-22
+        _, self.xe_bar_mean, self.s_sq_xe_mean = self.long_index.moments(_extension_mean)
 
         #Equation 8-23      
         self.a_mean = ((self.n1+self.ne_mean)*self.mu_hat_y-self.n1*self.ybar1)/self.ne_mean
@@ -271,23 +354,22 @@ class MOVE3(object):
             self.extended_short_years_mean = [np.nan]
 
 
-        #n2 extension
-        self.extension_record_n2 = self.additional_record
-        self.extension_years_n2 = self.additional_years
+        #n2 extension (every additional year less any exclude_years)
+        _extension_n2 = self.extension_pool()
+        _ne_n2 = len(_extension_n2)
+        self.extension_record_n2 = self.long_record[_extension_n2]
+        self.extension_years_n2 = [self.long_years[i] for i in _extension_n2]
         
-        #Equation 8-21
-        self.xe_bar_n2 = np.mean(self.extension_record_n2)
-
-        #Equation 8-22
-        self.s_sq_xe_n2 = self.comp_variance(self.extension_record_n2)
+        #Equation 8-21 and 8-22
+        _, self.xe_bar_n2, self.s_sq_xe_n2 = self.long_index.moments(_extension_n2)
         
         #Equation 8-23
-        self.a_n2 = ((self.n1+self.n2)*self.mu_hat_y-self.n1*self.ybar1)/self.n2
-        self._b_sq1_n2 = (self.n1 + self.n2-1)*self.sigma_hat_y_sq 
+        self.a_n2 = ((self.n1+_ne_n2)*self.mu_hat_y-self.n1*self.ybar1)/_ne_n2
+        self._b_sq1_n2 = (self.n1 + _ne_n2-1)*self.sigma_hat_y_sq 
         self._b_sq2_n2 = (self.n1-1)*self.s_sq_y1
         self._b_sq3_n2 = self.n1*(self.ybar1-self.mu_hat_y)**2
-        self._b_sq4_n2 = self.n2*(self.a_n2-self.mu_hat_y)**2
-        self._b_sq5_n2 = (self.n2-1)*self.s_sq_xe_n2
+        self._b_sq4_n2 = _ne_n2*(self.a_n2-self.mu_hat_y)**2
+        self._b_sq5_n2 = (_ne_n2-1)*self.s_sq_xe_n2
         
 
         #Equation 8-24
@@ -314,15 +396,13 @@ class MOVE3(object):
 
         self.extension_record_var = []
         self.extension_years_var = []
-        for idx_lu in idx_lus[-self.ne_var:]:
+        _extension_var = self.select_extension(self.ne_var)
+        for idx_lu in _extension_var:
             self.extension_record_var.append(self.long_record[idx_lu])
             self.extension_years_var.append(self.long_years[idx_lu])
         
-        #Equation 8-21
-        self.xe_bar_var = np.mean(self.extension_record_var)
-
-        #Equation 8-22
-        self.s_sq_xe_var = self.comp_variance(self.extension_record_var)
+        #Equation 8-21 and 8-22
+        _, self.xe_bar_var, self.s_sq_xe_var = self.long_index.moments(_extension_var)
         
         #Equation 8-23
         self.a_var = ((self.n1+self.ne_var)*self.mu_hat_y-self.n1*self.ybar1)/self.ne_var
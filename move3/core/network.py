@@ -0,0 +1,264 @@
+#-------------------------------------------------------------------------------
+# Name          Network record extension
+# Description:  Schedules MOVE.1 or MOVE.3 record extensions across a gage
+#               network where short records are extended from records that
+#               were themselves extended (e.g. C <- B <- A).  Sites are run
+#               level by level in dependency order, independent sites in a
+#               level run in parallel processes, and extended records are
+#               passed to downstream sites in memory.
+# Author:       Daniel Hamill
+#               US Army Corps of Engineers
+#               Sacramento District
+#               Daniel.D.Hamill@usace.army.mil
+# Created:      19 October 2026
+#-------------------------------------------------------------------------------
+
+from concurrent.futures import ProcessPoolExecutor
+import inspect
+
+import numpy as np
+import pandas as pd
+
+from .longrecord import LongRecordIndex
+from .move1 import MOVE1
+from .move3 import MOVE3
+
+
+class ExtensionNetwork(object):
+    """Directed graph of (short <- long) record extensions.
+
+    Records are given as arrays of times and flows.  Times are integer water
+    years for ``method='move3'`` and datetime64 values for ``method='move1'``.
+    For MOVE.3 ``extension`` selects the extended record passed downstream
+    ('var', 'mean' or 'n2').  Remaining keyword arguments are passed to
+    MOVE1/MOVE3.
+
+    When a level has more than one site to run they are submitted to a
+    ``ProcessPoolExecutor`` with ``max_workers``, created on first use and
+    kept until ``close`` (or the end of a ``with`` block), unless an
+    ``executor`` is given.  A level with a single site runs in process.
+    MOVE1/MOVE3 are CPU bound python, so a thread pool only helps when sites
+    wait on I/O.
+
+    ``results`` holds the scalar MOVE1/MOVE3 statistics of each extended
+    site (see ``RESULTS``).
+    """
+
+    METHODS = ('move1', 'move3')
+    EXTENSIONS = ('var', 'mean', 'n2')
+    RESULTS = {
+        'move1': ('n1', 'n2', 'p_hat', 'beta_hat', 'slope', 'intercept'),
+        'move3': ('n1', 'n2', 'p_hat', 'beta_hat', 'mu_hat_y', 'sigma_hat_y_sq',
+                  'ne_mean', 'ne_var'),
+    }
+
+    def __init__(self, method='move3', extension='var', roundInt=True,
+                 max_workers=None, executor=None, **kwargs) -> None:
+
+        if method not in self.METHODS:
+            raise ValueError(f"method must be one of {self.METHODS}, got '{method}'")
+        if extension not in self.EXTENSIONS:
+            raise ValueError(f"extension must be one of {self.EXTENSIONS}, got '{extension}'")
+
+        #fail on unknown MOVE1/MOVE3 arguments now rather than mid run
+        _cls = MOVE3 if method == 'move3' else MOVE1
+        inspect.signature(_cls).bind(None, roundInt=roundInt, long_index=None, **kwargs)
+
+        self.method = method
+        self.extension = extension
+        self.roundInt = roundInt
+        self.max_workers = max_workers
+        self.executor = executor
+        self.kwargs = kwargs
+        self._pool = None
+
+        #observed records, short site -> long site, current (extended) records
+        self.observed = {}
+        self.sources = {}
+        self.records = {}
+        self.results = {}
+        self._dirty = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Shut down the worker pool created by ``run``, if any."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _executor(self):
+        if self.executor is not None:
+            return self.executor
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def add_record(self, site, times, flows):
+        """Add or replace the observed record of a site.
+
+        The site and every site extended from it, directly or through other
+        sites, are rerun by the next ``run``.
+        """
+        times = np.asarray(times)
+        flows = np.asarray(flows, dtype=float)
+        assert len(times) == len(flows)
+        order = np.argsort(times, kind='stable')
+        self.observed[site] = (times[order], flows[order])
+        self._dirty.update(self.downstream(site))
+
+    update_record = add_record
+
+    def add_extension(self, short_site, long_site):
+        """Extend ``short_site`` from the (possibly extended) ``long_site``.
+
+        Raises ValueError, leaving the network unchanged, if the extension
+        would create a cycle or ``short_site`` is already extended.
+        """
+        if long_site in self.downstream(short_site):
+            raise ValueError(
+                f"Extending '{short_site}' from '{long_site}' would create a cycle"
+            )
+        if self.sources.get(short_site, long_site) != long_site:
+            raise ValueError(
+                f"Site '{short_site}' is already extended from '{self.sources[short_site]}'"
+            )
+        self.sources[short_site] = long_site
+        self._dirty.update(self.downstream(short_site))
+
+    def remove_extension(self, short_site):
+        """Stop extending ``short_site``; it and its downstream sites rerun."""
+        if short_site not in self.sources:
+            raise ValueError(f"Site '{short_site}' is not extended")
+        del self.sources[short_site]
+        self._dirty.update(self.downstream(short_site))
+
+    def downstream(self, site):
+        """The site and every site that depends on it."""
+        children = {}
+        for short_site, long_site in self.sources.items():
+            children.setdefault(long_site, []).append(short_site)
+
+        sites = [site]
+        seen = {site}
+        while sites:
+            for child in children.get(sites.pop(), []):
+                if child not in seen:
+                    seen.add(child)
+                    sites.append(child)
+        return seen
+
+    def levels(self):
+        """Topologically sorted levels of sites; raises ValueError on a cycle."""
+        sites = set(self.observed) | set(self.sources) | set(self.sources.values())
+        n_sources = {site: int(site in self.sources) for site in sites}
+        children = {}
+        for short_site, long_site in self.sources.items():
+            children.setdefault(long_site, []).append(short_site)
+
+        levels = []
+        level = sorted([site for site in sites if n_sources[site] == 0], key=str)
+        while level:
+            levels.append(level)
+            next_level = []
+            for site in level:
+                for child in children.get(site, []):
+                    n_sources[child] -= 1
+                    if n_sources[child] == 0:
+                        next_level.append(child)
+            level = sorted(next_level, key=str)
+
+        cycle = [site for site in sites if n_sources[site] > 0]
+        if cycle:
+            raise ValueError(f"Extension network contains a cycle through sites {sorted(cycle, key=str)}")
+        return levels
+
+    def run(self):
+        """Extend every site whose inputs changed since the last run.
+
+        Returns a dict of site -> (times, flows) for the sites that were run.
+        """
+        levels = self.levels()
+        missing = [site for level in levels for site in level if site not in self.observed]
+        if missing:
+            raise ValueError(f"No observed record for sites {missing}")
+
+        updated = {}
+        for level in levels:
+            dirty = [site for site in level if site in self._dirty]
+            extend = [site for site in dirty if site in self.sources]
+
+            #one LongRecordIndex per long site; a worker process receives its
+            #own pickled copy with each submission
+            long_indexes = {}
+            for site in extend:
+                long_site = self.sources[site]
+                if long_site not in long_indexes:
+                    long_indexes[long_site] = LongRecordIndex(*self.records[long_site])
+
+            def _args(site):
+                return (self.method, self.extension, self.roundInt, self.kwargs,
+                        *self.observed[site], long_indexes[self.sources[site]])
+
+            if len(extend) > 1:
+                executor = self._executor()
+                futures = {site: executor.submit(_extend, *_args(site)) for site in extend}
+                extended = {site: future.result() for site, future in futures.items()}
+            else:
+                extended = {site: _extend(*_args(site)) for site in extend}
+
+            for site in dirty:
+                if site in extended:
+                    res, record = extended[site]
+                    if res is None:
+                        raise ValueError(
+                            f"Record extension of site '{site}' from '{self.sources[site]}' failed"
+                        )
+                else:
+                    res, record = None, self.observed[site]
+                self.results[site], self.records[site] = res, record
+                updated[site] = record
+                self._dirty.discard(site)
+        return updated
+
+
+def _short_data(method, times, flows):
+    if method == 'move3':
+        time_col = 'WY'
+        times = pd.to_datetime(pd.Series(times).astype(str), format='%Y')
+    else:
+        time_col = 'date'
+        times = pd.Series(times)
+    return pd.DataFrame({time_col: times, 'FLOW': flows, 'recordType': 'Short Record'})
+
+
+def _extend(method, extension, roundInt, kwargs, times, flows, long_index):
+    """Extend one short record; module level so it can run in a worker process.
+
+    Returns (dict of scalar results, (times, flows)), with None results when
+    the extension failed.
+    """
+    short_data = _short_data(method, times, flows)
+    if method == 'move3':
+        res = MOVE3(short_data, roundInt=roundInt, long_index=long_index, **kwargs)
+        res.calculate()
+        ext_times = getattr(res, f'extension_years_{extension}')
+        ext_flows = getattr(res, f'extension_short_record_{extension}')
+    else:
+        res = MOVE1(short_data, roundInt=roundInt, long_index=long_index, **kwargs)
+        res.calculate()
+        ext_times = res.extension_dates
+        ext_flows = res.extension_short_record
+
+    if len(ext_flows) != len(ext_times) or np.any(np.isnan(np.asarray(ext_flows, dtype=float))):
+        return None, (times, flows)
+
+    ext_times = np.concatenate([np.asarray(ext_times, dtype=times.dtype), times])
+    ext_flows = np.concatenate([np.asarray(ext_flows, dtype=float), flows])
+    order = np.argsort(ext_times, kind='stable')
+    results = {name: getattr(res, name) for name in ExtensionNetwork.RESULTS[method]}
+    return results, (ext_times[order], ext_flows[order])
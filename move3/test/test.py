@@ -1,7 +1,14 @@
+import os
 import pandas as pd
+import pytest
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from move3.core.move3 import MOVE3
 from move3.core.move1 import MOVE1
+from move3.core.longrecord import LongRecordIndex
+from move3.core.network import ExtensionNetwork
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
 
 DATA_URLS = {
     'long':'https://raw.githubusercontent.com/danhamill/MOVE3/master/move3/data/Etowah.csv',
@@ -79,12 +86,247 @@ class TestClass:
             
         print('MOVE3 passed all tests...')
 
+    def test_long_record_index(self):
+        short_data = self.getCSVdata(DATA_URLS['short'], 'Short Record')
+        long_data = self.getCSVdata(DATA_URLS['long'],  'Long Record')
+
+        merge = self.merge_flow_data(short_data, long_data)
+        long_index = LongRecordIndex.from_merge_data(merge, 'WY')
+
+        res = MOVE3(merge)
+        res.calculate()
+
+        #index reused with only the short record rows
+        res_idx = MOVE3(self.merge_flow_data(short_data, long_data.iloc[:0]), long_index=long_index)
+        res_idx.calculate()
+
+        assert res_idx.concurrent_years == res.concurrent_years
+        assert res_idx.additional_years == res.additional_years
+
+        #long record year list is converted once and shared
+        res_idx2 = MOVE3(self.merge_flow_data(short_data, long_data.iloc[:0]), long_index=long_index)
+        assert res_idx2.long_years is res_idx.long_years is long_index.time_list
+
+        n, mean, var = long_index.moments(res._ind1)
+        assert n == res.n1
+        assert np.allclose(mean, np.mean(res.con_long_record), rtol=1e-12)
+        assert np.allclose(var, np.var(res.con_long_record, ddof=1), rtol=1e-12)
+
+        assert np.allclose(res_idx.xbar2, np.mean(res.additional_record), rtol=1e-12)
+        assert np.allclose(res_idx.s_sq_x2, np.var(res.additional_record, ddof=1), rtol=1e-12)
+
+        assert np.allclose(res_idx.extended_short_record_var, res.extended_short_record_var)
+
+        print('LongRecordIndex passed all tests...')
+
+    def test_move3_extension_window(self):
+
+        #16 additional years (mean 3, variance 2.4) then 12 concurrent years
+        additional = [3,3,3,3, 2,4,2,4, 5,5,5,5, 1,1,1,1]
+        concurrent = 3 + 0.2*np.sin(np.arange(12))
+        long_data = pd.DataFrame({
+            'WY': np.arange(1901, 1929),
+            'FLOW': 10**np.concatenate([additional, concurrent]),
+            'recordType': 'Long Record'
+        })
+        short_data = pd.DataFrame({
+            'WY': np.arange(1917, 1929),
+            'FLOW': 10**(concurrent - 0.5),
+            'recordType': 'Short Record'
+        })
+        merge = self.merge_flow_data(short_data, long_data)
+
+        res = MOVE3(merge, extension_method='window')
+        assert np.allclose([res.xbar2, res._s_sq_x2], [3, 2.4])
+
+        #[2,4,2,4] matches the additional mean exactly, closest variance
+        assert [res.long_years[i] for i in res.select_extension(4)] == [1905, 1906, 1907, 1908]
+
+        #excluding 1906 (a 4) leaves mean 44/15, variance ~2.50; the window
+        #skips over it and [2,2,4,5] is now the closest match
+        res = MOVE3(merge, extension_method='window', exclude_years=[1906])
+        assert [res.long_years[i] for i in res.select_extension(4)] == [1905, 1907, 1908, 1909]
+
+        #excluded years are kept out of the n2 extension too
+        res.calculate()
+        assert 1906 not in res.extension_years_n2
+        assert res.extension_years_n2 == [y for y in range(1901, 1917) if y != 1906]
+        assert len(res.extension_record_n2) == 15
+
+        #short record in the middle of the long record: windows span the
+        #concurrent period just as the most recent ne years do
+        long_data = self.getCSVdata(os.path.join(DATA_DIR, 'Etowah.csv'), 'Long Record')
+        short_data = long_data.loc[(long_data.WY >= 1930) & (long_data.WY <= 1964)].copy()
+        short_data.loc[:, 'recordType'] = 'Short Record'
+        short_data.loc[:, 'FLOW'] = short_data.FLOW.values*0.4*(1+0.3*np.sin(np.arange(len(short_data))))
+        merge = self.merge_flow_data(short_data, long_data)
+
+        res = MOVE3(merge, extension_method='window')
+        res.calculate()
+        #longest runs of non-concurrent years are 38 (1892-1929) and 40 (1965-2004)
+        assert res.ne_mean > 40
+        assert len(res.extension_years_mean) == res.ne_mean
+        assert min(res.extension_years_mean) < 1930 and max(res.extension_years_mean) > 1964
+        assert not set(res.extension_years_mean) & set(range(1930, 1965))
+        assert not np.any(np.isnan(res.extended_short_record_mean))
+        assert len(res.extension_years_var) == res.ne_var
+
+        print('MOVE3 extension window passed all tests...')
+
+    def test_move1_tolerance(self):
+
+        mergeData = pd.read_feather(os.path.join(DATA_DIR, 'MOVE1_testData.feather'))
+
+        res = MOVE1(mergeData)
+        res.calculate()
+
+        #offset the short record observations by six hours
+        offsetData = mergeData.copy()
+        isShort = offsetData.recordType == 'Short Record'
+        offsetData.loc[isShort, 'date'] = offsetData.loc[isShort, 'date'] + pd.Timedelta('6H')
+
+        res_tol = MOVE1(offsetData, tolerance=pd.Timedelta('12H'), direction='backward')
+        res_tol.calculate()
+
+        assert res_tol.concurrent_dates == res.concurrent_dates
+        assert len(res_tol.matched_pairs) == res.n1
+        assert np.all(res_tol.time_lags == np.timedelta64(6, 'h'))
+
+        assert np.allclose(res_tol.slope, res.slope)
+        assert np.allclose(res_tol.p_hat, res.p_hat)
+        assert np.allclose(res_tol.extension_short_record, res.extension_short_record)
+
+        shortDates = offsetData.loc[isShort, 'date'].values
+        assert len(res_tol.long_index.locate(shortDates)[0]) == 0
+        assert len(res_tol.long_index.locate(shortDates, pd.Timedelta('12H'), 'forward')[0]) == 0
+
+        assert isinstance(res_tol.time_lags, np.ndarray)
+
+        with pytest.raises(ValueError):
+            MOVE1(offsetData, direction='nearst')
+
+        with pytest.raises(TypeError):
+            MOVE1(offsetData, tolerance=1)
+
+        with pytest.raises(ValueError):
+            MOVE1(offsetData, tolerance=pd.Timedelta('-12H'))
+
+        print('MOVE1 tolerance passed all tests....')
+
+    def test_move3_tolerance(self):
+
+        #long record in even water years, short record in odd water years
+        long_data = pd.DataFrame({
+            'WY': np.arange(1900, 1956, 2),
+            'FLOW': 10**(3 + 0.2*np.sin(np.arange(28))),
+            'recordType': 'Long Record'
+        })
+        short_data = pd.DataFrame({
+            'WY': np.arange(1931, 1955, 2),
+            'FLOW': 10**(2.5 + 0.2*np.sin(np.arange(15, 27))),
+            'recordType': 'Short Record'
+        })
+        merge = self.merge_flow_data(short_data, long_data)
+
+        res = MOVE3(merge, tolerance=1, direction='backward')
+        assert res.concurrent_years == list(range(1930, 1954, 2))
+        assert isinstance(res.time_lags, np.ndarray)
+        assert np.all(res.time_lags == 1)
+        assert res.n2 == 16
+
+        res.calculate()
+        assert np.allclose(res.p_hat, 1)
+
+        with pytest.raises(ValueError):
+            MOVE3(merge, direction='nearst')
+
+        with pytest.raises(TypeError):
+            MOVE3(merge, tolerance=pd.Timedelta('1D'))
+
+        with pytest.raises(ValueError):
+            MOVE3(merge, tolerance=-1)
+
+        print('MOVE3 tolerance passed all tests...')
+
+    def test_extension_network(self):
+        short_data = self.getCSVdata(DATA_URLS['short'], 'Short Record')
+        long_data = self.getCSVdata(DATA_URLS['long'],  'Long Record')
+
+        merge = self.merge_flow_data(short_data, long_data)
+        res = MOVE3(merge)
+        res.calculate()
+
+        #synthetic site extended from the extended short record
+        c_data = long_data.iloc[-15:]
+        c_flows = c_data.FLOW.values*0.3*(1+0.2*np.sin(np.arange(15)))
+
+        net = ExtensionNetwork()
+        net.add_record('A', long_data.WY.values, long_data.FLOW.values)
+        net.add_record('B', short_data.WY.values, short_data.FLOW.values)
+        net.add_record('C', c_data.WY.values, c_flows)
+        net.add_extension('C', 'B')
+        net.add_extension('B', 'A')
+
+        assert net.levels() == [['A'], ['B'], ['C']]
+
+        out = net.run()
+        assert sorted(out) == ['A', 'B', 'C']
+
+        #B matches a direct MOVE3 run
+        order = np.argsort(res.extended_short_years_var)
+        assert out['B'][0].tolist() == np.array(res.extended_short_years_var)[order].tolist()
+        assert np.allclose(out['B'][1], np.array(res.extended_short_record_var)[order])
+        assert len(out['C'][0]) == len(c_flows) + net.results['C']['ne_var']
+
+        #only downstream sites rerun
+        net.update_record('B', short_data.WY.values, short_data.FLOW.values*1.1)
+        assert sorted(net.run()) == ['B', 'C']
+        assert net.run() == {}
+
+        #an extension closing a cycle is rejected and the network unchanged
+        with pytest.raises(ValueError):
+            net.add_extension('A', 'C')
+        assert net.sources == {'B': 'A', 'C': 'B'}
+        assert net.run() == {}
+
+        #C extended from A directly, with a caller supplied executor
+        net.remove_extension('C')
+        assert net.levels() == [['A', 'C'], ['B']]
+        net.add_extension('C', 'A')
+        with ThreadPoolExecutor() as executor:
+            net.executor = executor
+            assert sorted(net.run()) == ['C']
+        net.executor = None
+        assert net.levels() == [['A'], ['B', 'C']]
+
+        #B and C now share a level and run on a worker pool kept across runs
+        net.update_record('A', long_data.WY.values, long_data.FLOW.values)
+        with net:
+            assert sorted(net.run()) == ['A', 'B', 'C']
+            pool = net._pool
+            assert pool is not None
+            net.update_record('A', long_data.WY.values, long_data.FLOW.values*1.01)
+            net.run()
+            assert net._pool is pool
+        assert net._pool is None
+        assert set(net.results['B']) == set(ExtensionNetwork.RESULTS['move3'])
+
+        with pytest.raises(TypeError):
+            ExtensionNetwork('move1', extension_method='window')
+
+        print('ExtensionNetwork passed all tests...')
+
 
 if __name__ == '__main__':
 
     tc = TestClass()
     tc.test_move1()
     tc.test_move3()
+    tc.test_long_record_index()
+    tc.test_move3_extension_window()
+    tc.test_move1_tolerance()
+    tc.test_move3_tolerance()
+    tc.test_extension_network()
 
 
 